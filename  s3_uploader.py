@@ -1,28 +1,68 @@
 import boto3
+import gzip
+import numpy as np
 import pandas as pd
-import random
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from datetime import datetime, timedelta
 import json
 import os
-from io import StringIO
+from io import BytesIO
+
+# Connection pool size for the shared S3 client (multipart parts upload concurrently)
+MAX_POOL_CONNECTIONS = 64
+
+# gzip level for CSV/JSON bodies; level 3 trades a little ratio for much faster compression
+GZIP_COMPRESSLEVEL = 3
+
+# Bodies larger than this are sent as a multipart upload instead of one PUT
+LARGE_UPLOAD_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10
+)
+
+# CRC32 checksums are computed in C (zlib) instead of hashing the payload with MD5/SHA256
+CHECKSUM_ALGORITHM = 'CRC32'
 
 class S3DataUploader:
-    def __init__(self, bucket_name, aws_profile=None):
+    def __init__(self, bucket_name, aws_profile=None, use_accelerate=False, seed=None):
         """
         Initialize S3 uploader
         
         Args:
             bucket_name (str): Name of S3 bucket
             aws_profile (str): AWS profile name (optional)
+            use_accelerate (bool): Upload through the S3 Transfer Acceleration endpoint
+                (the bucket must have acceleration enabled, see enable_transfer_acceleration)
+            seed (int): Seed for reproducible sample data (optional)
         """
         self.bucket_name = bucket_name
         
+        # PCG64 generator for sample data
+        self._rng = np.random.default_rng(seed)
+        
+        # Connection pool sized so concurrent multipart parts don't hit "Connection pool is full"
+        client_config = Config(
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+            retries={'mode': 'adaptive', 'max_attempts': 10},
+            s3={
+                'use_accelerate_endpoint': use_accelerate,
+                'payload_signing_enabled': False
+            },
+            tcp_keepalive=True
+        )
+        
         # Initialize S3 client
         if aws_profile:
-            session = boto3.Session(profile_name=aws_profile)
-            self.s3_client = session.client('s3')
+            self._session = boto3.Session(profile_name=aws_profile)
         else:
-            self.s3_client = boto3.client('s3')
+            self._session = boto3.Session()
+        self.s3_client = self._session.client('s3', config=client_config)
     
     def generate_sample_data(self, date=None, num_records=50):
         """
@@ -37,6 +77,7 @@ class S3DataUploader:
         """
         if date is None:
             date = datetime.now()
+        rng = self._rng
         
         # Sample categories and descriptions
         income_categories = [
@@ -61,42 +102,65 @@ class S3DataUploader:
             ('healthcare', 'Pharmacy')
         ]
         
-        data = []
+        n = num_records
+        income_table = np.array(income_categories)
+        expense_table = np.array(expense_categories)
         
-        for i in range(num_records):
-            # Random transaction type (70% expenses, 30% income)
-            is_income = random.random() < 0.3
-            
-            if is_income:
-                category, description = random.choice(income_categories)
-                amount = round(random.uniform(500, 5000), 2)
-            else:
-                category, description = random.choice(expense_categories)
-                amount = -round(random.uniform(10, 500), 2)
-            
-            # Add some time variation within the day
-            transaction_time = date + timedelta(
-                hours=random.randint(6, 22),
-                minutes=random.randint(0, 59)
-            )
-            
-            data.append({
-                'transaction_id': f"TXN_{date.strftime('%Y%m%d')}_{i+1:04d}",
-                'date': transaction_time.strftime('%Y-%m-%d'),
-                'timestamp': transaction_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'amount': amount,
-                'category': category,
-                'description': description,
-                'transaction_type': 'income' if is_income else 'expense',
-                'account': random.choice(['checking', 'savings', 'credit_card']),
-                'location': random.choice(['Online', 'New York', 'Los Angeles', 'Chicago', 'Houston'])
-            })
-        
-        return pd.DataFrame(data)
+        # Random transaction type (70% expenses, 30% income)
+        is_income = rng.random(n) < 0.3
+        
+        income_picks = income_table[rng.integers(0, len(income_table), n)]
+        expense_picks = expense_table[rng.integers(0, len(expense_table), n)]
+        categories = np.where(is_income, income_picks[:, 0], expense_picks[:, 0])
+        descriptions = np.where(is_income, income_picks[:, 1], expense_picks[:, 1])
+        # Amounts are integer cents: income $500-$5000, expenses $10-$500
+        amounts = np.where(
+            is_income,
+            rng.integers(50_000, 500_001, n, dtype=np.int32),
+            -rng.integers(1_000, 50_001, n, dtype=np.int32)
+        )
+        
+        # Add some time variation within the day
+        offsets = pd.to_timedelta(
+            rng.integers(6, 23, n) * 60 + rng.integers(0, 60, n),
+            unit='m'
+        )
+        transaction_times = pd.Timestamp(date) + offsets
+        ymd = date.strftime('%Y%m%d')
+        
+        # Sequential ids (TXN_YYYYMMDD_0001, ...) built with vectorized string ops
+        # (NumPy 2's zfill fails on an empty array, so skip it when n == 0)
+        sequence = np.arange(1, n + 1).astype(str)
+        if n:
+            sequence = np.char.zfill(sequence, 4)
+        transaction_ids = np.char.add(f"TXN_{ymd}_", sequence)
+        
+        return pd.DataFrame({
+            'transaction_id': transaction_ids,
+            'date': transaction_times.strftime('%Y-%m-%d'),
+            'timestamp': transaction_times.strftime('%Y-%m-%d %H:%M:%S'),
+            'amount_cents': amounts,
+            'category': categories,
+            'description': descriptions,
+            'transaction_type': np.where(is_income, 'income', 'expense'),
+            'account': rng.choice(['checking', 'savings', 'credit_card'], n),
+            'location': rng.choice(['Online', 'New York', 'Los Angeles', 'Chicago', 'Houston'], n)
+        })
+    
+    def draw_record_count(self, low, high):
+        """Draw a record count in [low, high] from the uploader's generator"""
+        return int(self._rng.integers(low, high + 1))
+    
+    @staticmethod
+    def _partition_key(folder, date, suffix):
+        """Build the Hive-style year=/month=/day= S3 key for a day's transactions file"""
+        ymd = date.strftime('%Y%m%d')
+        year, month, day = ymd[:4], ymd[4:6], ymd[6:8]
+        return f"{folder}/year={year}/month={month}/day={day}/transactions-{ymd}{suffix}"
     
     def upload_csv_data(self, df, date=None, folder='raw-data'):
         """
-        Upload DataFrame as CSV to S3 with partitioned structure
+        Upload DataFrame as gzip-compressed CSV to S3 with partitioned structure
         
         Args:
             df (pandas.DataFrame): Data to upload
@@ -110,25 +174,85 @@ class S3DataUploader:
             date = datetime.now()
         
         # Create partitioned key structure
-        year = date.strftime('%Y')
-        month = date.strftime('%m')
-        day = date.strftime('%d')
-        filename = f"transactions-{date.strftime('%Y%m%d')}.csv"
+        s3_key = self._partition_key(folder, date, '.csv.gz')
         
-        s3_key = f"{folder}/year={year}/month={month}/day={day}/{filename}"
+        # Serialize DataFrame straight to gzipped UTF-8 bytes (no intermediate str copy)
+        csv_buffer = BytesIO()
+        df.to_csv(
+            csv_buffer,
+            index=False,
+            encoding='utf-8',
+            compression={'method': 'gzip', 'compresslevel': GZIP_COMPRESSLEVEL}
+        )
+        body_size = csv_buffer.tell()
+        csv_buffer.seek(0)
         
-        # Convert DataFrame to CSV string
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
+        extra_args = {
+            'ContentType': 'text/csv',
+            'ContentEncoding': 'gzip',
+            'ChecksumAlgorithm': CHECKSUM_ALGORITHM,
+            'Metadata': {
+                'upload_timestamp': datetime.now().isoformat(),
+                'record_count': str(len(df)),
+                'data_date': date.strftime('%Y-%m-%d')
+            }
+        }
+        
+        # Upload to S3
+        try:
+            if body_size > LARGE_UPLOAD_THRESHOLD:
+                self.s3_client.upload_fileobj(
+                    csv_buffer,
+                    self.bucket_name,
+                    s3_key,
+                    ExtraArgs=extra_args,
+                    Config=MULTIPART_TRANSFER_CONFIG
+                )
+            else:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Body=csv_buffer,
+                    **extra_args
+                )
+            print(f"✅ Successfully uploaded {len(df)} records to s3://{self.bucket_name}/{s3_key}")
+            return s3_key
+            
+        except Exception as e:
+            print(f"❌ Error uploading to S3: {str(e)}")
+            raise
+    
+    def upload_json_data(self, df, date=None, folder='raw-data'):
+        """
+        Upload DataFrame as gzip-compressed JSON to S3
+        
+        Args:
+            df (pandas.DataFrame): Data to upload
+            date (datetime): Date for partitioning (default: today)
+            folder (str): S3 folder name
+        
+        Returns:
+            str: S3 key of uploaded file
+        """
+        if date is None:
+            date = datetime.now()
+        
+        # Create partitioned key structure
+        s3_key = self._partition_key(folder, date, '.json.gz')
+        
+        # Convert DataFrame to gzipped JSON
+        json_data = df.to_json(orient='records', date_format='iso')
+        json_data = gzip.compress(json_data.encode('utf-8'), compresslevel=GZIP_COMPRESSLEVEL)
         
         # Upload to S3
         try:
             self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=s3_key,
-                Body=csv_data,
-                ContentType='text/csv',
+                Body=json_data,
+                ContentType='application/json',
+                ContentEncoding='gzip',
+                ChecksumAlgorithm=CHECKSUM_ALGORITHM,
                 Metadata={
                     'upload_timestamp': datetime.now().isoformat(),
                     'record_count': str(len(df)),
@@ -142,9 +266,9 @@ class S3DataUploader:
             print(f"❌ Error uploading to S3: {str(e)}")
             raise
     
-    def upload_json_data(self, df, date=None, folder='raw-data'):
+    def upload_parquet_data(self, df, date=None, folder='raw-data'):
         """
-        Upload DataFrame as JSON to S3
+        Upload DataFrame as zstd-compressed Parquet to S3 with partitioned structure
         
         Args:
             df (pandas.DataFrame): Data to upload
@@ -158,23 +282,20 @@ class S3DataUploader:
             date = datetime.now()
         
         # Create partitioned key structure
-        year = date.strftime('%Y')
-        month = date.strftime('%m')
-        day = date.strftime('%d')
-        filename = f"transactions-{date.strftime('%Y%m%d')}.json"
+        s3_key = self._partition_key(folder, date, '.parquet')
         
-        s3_key = f"{folder}/year={year}/month={month}/day={day}/{filename}"
-        
-        # Convert DataFrame to JSON
-        json_data = df.to_json(orient='records', date_format='iso')
+        # Convert DataFrame to Parquet bytes
+        parquet_buffer = BytesIO()
+        df.to_parquet(parquet_buffer, engine='pyarrow', compression='zstd', index=False)
         
         # Upload to S3
         try:
             self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=s3_key,
-                Body=json_data,
-                ContentType='application/json',
+                Body=parquet_buffer.getvalue(),
+                ContentType='application/x-parquet',
+                ChecksumAlgorithm=CHECKSUM_ALGORITHM,
                 Metadata={
                     'upload_timestamp': datetime.now().isoformat(),
                     'record_count': str(len(df)),
@@ -201,44 +322,98 @@ class S3DataUploader:
                 print(f"❌ Error creating bucket: {str(e)}")
                 raise
     
-    def upload_historical_data(self, days_back=30):
+    def enable_transfer_acceleration(self):
+        """Enable S3 Transfer Acceleration on the bucket"""
+        try:
+            self.s3_client.put_bucket_accelerate_configuration(
+                Bucket=self.bucket_name,
+                AccelerateConfiguration={'Status': 'Enabled'}
+            )
+            print(f"✅ Transfer acceleration enabled on '{self.bucket_name}'")
+        except Exception as e:
+            print(f"❌ Error enabling transfer acceleration: {str(e)}")
+            raise
+    
+    def upload_historical_data(self, days_back=30, folder='raw-data'):
         """
-        Upload historical data for multiple days
+        Upload historical data for multiple days as one day-partitioned Parquet dataset
         
         Args:
             days_back (int): Number of days of historical data to generate
+            folder (str): S3 folder name
         """
         print(f"📊 Generating {days_back} days of historical data...")
         
-        for i in range(days_back):
-            date = datetime.now() - timedelta(days=i)
+        now = datetime.now()
+        # Generate varying amounts of data (20-100 records per day)
+        record_counts = self._rng.integers(20, 101, days_back)
+        frames = []
+        for i, num_records in enumerate(record_counts):
+            date = now - timedelta(days=i)
+            ymd = date.strftime('%Y%m%d')
             
-            # Generate varying amounts of data (20-100 records per day)
-            num_records = random.randint(20, 100)
-            df = self.generate_sample_data(date=date, num_records=num_records)
-            
-            # Upload as CSV
-            self.upload_csv_data(df, date=date)
-            
-            if i % 10 == 0:
-                print(f"📈 Processed {i+1}/{days_back} days...")
+            # Hive-style year=/month=/day= partition columns from the generation
+            # date, matching _partition_key (late transactions can roll past midnight)
+            frames.append(
+                self.generate_sample_data(date=date, num_records=num_records)
+                .assign(year=ymd[:4], month=ymd[4:6], day=ymd[6:8])
+            )
+        df = pd.concat(frames, ignore_index=True)
         
-        print("✅ Historical data upload complete!")
+        # One file per day partition, written concurrently by pyarrow. Re-running
+        # a backfill overwrites its own transactions-0.parquet in each day and
+        # leaves other objects (e.g. daily uploads) alone. create_dir=False stops
+        # pyarrow writing zero-byte directory markers that would trigger the Lambda.
+        try:
+            ds.write_dataset(
+                pa.Table.from_pandas(df, preserve_index=False),
+                f"{self.bucket_name}/{folder}",
+                format='parquet',
+                file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+                filesystem=self._arrow_filesystem(),
+                partitioning=['year', 'month', 'day'],
+                partitioning_flavor='hive',
+                basename_template='transactions-{i}.parquet',
+                existing_data_behavior='overwrite_or_ignore',
+                create_dir=False
+            )
+        except Exception as e:
+            print(f"❌ Error uploading to S3: {str(e)}")
+            raise
+        
+        print(f"✅ Historical data upload complete! ({len(df)} records over {days_back} days)")
+    
+    def _arrow_filesystem(self):
+        """Build a pyarrow S3 filesystem using the same credentials and region as s3_client"""
+        credentials = self._session.get_credentials().get_frozen_credentials()
+        return pafs.S3FileSystem(
+            access_key=credentials.access_key,
+            secret_key=credentials.secret_key,
+            session_token=credentials.token,
+            region=self.s3_client.meta.region_name
+        )
     
     def list_uploaded_files(self, prefix='raw-data'):
         """List files in the S3 bucket"""
         try:
-            response = self.s3_client.list_objects_v2(
+            # Paginate so buckets with more than 1000 keys aren't truncated
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            pages = paginator.paginate(
                 Bucket=self.bucket_name,
-                Prefix=prefix
+                Prefix=prefix,
+                PaginationConfig={'PageSize': 1000}
             )
             
-            if 'Contents' in response:
-                print(f"\n📁 Files in s3://{self.bucket_name}/{prefix}:")
-                for obj in response['Contents']:
+            file_count = 0
+            for page in pages:
+                for obj in page.get('Contents', []):
+                    if file_count == 0:
+                        print(f"\n📁 Files in s3://{self.bucket_name}/{prefix}:")
+                    file_count += 1
                     size_mb = obj['Size'] / (1024 * 1024)
                     print(f"  📄 {obj['Key']} ({size_mb:.2f} MB) - {obj['LastModified']}")
-            else:
+            
+            if file_count == 0:
                 print(f"No files found in s3://{self.bucket_name}/{prefix}")
                 
         except Exception as e:
@@ -267,8 +442,8 @@ def main():
     print("\nSample data:")
     print(today_data.head())
     
-    # Upload as CSV
-    uploader.upload_csv_data(today_data)
+    # Upload as Parquet
+    uploader.upload_parquet_data(today_data)
     
     # Option 2: Upload historical data (uncomment if needed)
     # uploader.upload_historical_data(days_back=7)
@@ -289,17 +464,17 @@ if __name__ == "__main__":
 class DailyDataGenerator:
     """Class for scheduled daily data generation"""
     
-    def __init__(self, bucket_name):
-        self.uploader = S3DataUploader(bucket_name)
+    def __init__(self, bucket_name, seed=None):
+        self.uploader = S3DataUploader(bucket_name, seed=seed)
     
     def run_daily_upload(self):
         """Run daily data upload - can be called by cron job"""
         try:
             # Generate data for today
-            data = self.uploader.generate_sample_data(num_records=random.randint(50, 150))
+            data = self.uploader.generate_sample_data(num_records=self.uploader.draw_record_count(50, 150))
             
             # Upload to S3
-            s3_key = self.uploader.upload_csv_data(data)
+            s3_key = self.uploader.upload_parquet_data(data)
             
             print(f"✅ Daily upload successful: {s3_key}")
             return True
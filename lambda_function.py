@@ -1,9 +1,18 @@
+import gzip
 import json
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+import numpy as np
 import pandas as pd
-from io import StringIO
+from io import BytesIO
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime
+from decimal import Decimal
 import os
 import logging
 
@@ -11,6 +20,44 @@ import logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Copy-on-write lets transform_data mutate frames without defensive full copies
+pd.set_option('mode.copy_on_write', True)
+
+# Column order for the portfolio_transactions table
+REDSHIFT_COLUMNS = [
+    'transaction_id', 'date', 'timestamp', 'amount', 'amount_abs', 'amount_category',
+    'category', 'description', 'transaction_type', 'account', 'location',
+    'day_of_week', 'month', 'year', 'processed_timestamp', 'processed_by', 'source_file'
+]
+
+# Rows sent per multi-row INSERT statement
+REDSHIFT_PAGE_SIZE = 1000
+
+# pyarrow CSV parsing options; timestamps match the uploader's output format
+CSV_READ_OPTIONS = pacsv.ReadOptions(block_size=8 << 20)
+CSV_CONVERT_OPTIONS = pacsv.ConvertOptions(timestamp_parsers=['%Y-%m-%d %H:%M:%S'])
+
+# Created once per container and reused across warm invocations
+S3_CLIENT = boto3.client(
+    's3',
+    config=Config(
+        max_pool_connections=50,
+        retries={'mode': 'adaptive', 'max_attempts': 5}
+    )
+)
+
+# Objects at or above this size are fetched with concurrent byte-range GETs
+MULTIPART_DOWNLOAD_THRESHOLD = 8 * 1024 * 1024
+DOWNLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_DOWNLOAD_THRESHOLD,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True
+)
+
+# Redshift connection kept open across warm invocations (see get_redshift_connection)
+_redshift_conn = None
+
 def lambda_handler(event, context):
     """
     Main Lambda handler triggered by S3 events
@@ -22,6 +69,7 @@ def lambda_handler(event, context):
         s3_event = event['Records'][0]['s3']
         bucket_name = s3_event['bucket']['name']
         object_key = s3_event['object']['key']
+        object_size = s3_event['object'].get('size')
         
         logger.info(f"Processing file: s3://{bucket_name}/{object_key}")
         
@@ -33,11 +81,8 @@ def lambda_handler(event, context):
                 'body': json.dumps('File skipped - not in raw-data folder')
             }
         
-        # Initialize S3 client
-        s3_client = boto3.client('s3')
-        
         # Read and transform data
-        df = read_s3_data(s3_client, bucket_name, object_key)
+        df = read_s3_data(S3_CLIENT, bucket_name, object_key, object_size)
         transformed_df = transform_data(df)
         
         # Load to Redshift (if configured)
@@ -47,7 +92,7 @@ def lambda_handler(event, context):
             logger.info("Redshift not configured - skipping database load")
         
         # Save processed data back to S3
-        save_processed_data(s3_client, bucket_name, transformed_df, object_key)
+        save_processed_data(S3_CLIENT, bucket_name, transformed_df, object_key)
         
         logger.info(f"Successfully processed {len(transformed_df)} records")
         
@@ -71,17 +116,36 @@ def lambda_handler(event, context):
         }
 
 
-def read_s3_data(s3_client, bucket_name, object_key):
+def read_s3_data(s3_client, bucket_name, object_key, object_size=None):
     """
-    Read CSV data from S3 and return as DataFrame
+    Read CSV or Parquet data from S3 and return as DataFrame
     """
     try:
         # Get object from S3
-        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-        data = response['Body'].read().decode('utf-8')
+        if object_size is not None and object_size < MULTIPART_DOWNLOAD_THRESHOLD:
+            response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+            data = response['Body'].read()
+        else:
+            # Large or unknown size: parallel byte-range GETs into memory
+            buffer = BytesIO()
+            s3_client.download_fileobj(bucket_name, object_key, buffer, Config=DOWNLOAD_TRANSFER_CONFIG)
+            data = buffer.getbuffer()
+        
+        # Decompress gzipped uploads (e.g. transactions-20240726.csv.gz)
+        if object_key.endswith('.gz'):
+            data = gzip.decompress(data)
         
         # Read into pandas DataFrame
-        df = pd.read_csv(StringIO(data))
+        if object_key.removesuffix('.gz').endswith('.parquet'):
+            df = pd.read_parquet(BytesIO(data))
+        else:
+            # Parse the raw bytes with pyarrow's multithreaded reader (no str decode)
+            table = pacsv.read_csv(
+                pa.BufferReader(data),
+                read_options=CSV_READ_OPTIONS,
+                convert_options=CSV_CONVERT_OPTIONS
+            )
+            df = table.to_pandas()
         
         logger.info(f"Successfully read {len(df)} records from S3")
         logger.info(f"Columns: {list(df.columns)}")
@@ -95,76 +159,90 @@ def read_s3_data(s3_client, bucket_name, object_key):
 
 def transform_data(df):
     """
-    Apply data transformations
+    Apply data transformations and return the transformed DataFrame
     """
     logger.info("Starting data transformations")
     
     try:
-        # Create a copy to avoid modifying original
-        df_transformed = df.copy()
+        # Amounts are integer cents in 'amount_cents'; raw files written before the
+        # switch to cents carry float dollars in 'amount' and are converted here
+        if 'amount_cents' not in df.columns and 'amount' in df.columns:
+            df['amount_cents'] = pd.to_numeric(df['amount'], errors='coerce') * 100
+            df = df.drop(columns='amount')
         
         # Basic data cleaning
-        initial_count = len(df_transformed)
-        df_transformed = df_transformed.dropna(subset=['transaction_id', 'amount'])
-        logger.info(f"Removed {initial_count - len(df_transformed)} rows with missing critical data")
+        initial_count = len(df)
+        df = df.dropna(subset=['transaction_id', 'amount_cents'])
+        logger.info(f"Removed {initial_count - len(df)} rows with missing critical data")
         
-        # Data type conversions
-        if 'amount' in df_transformed.columns:
-            df_transformed['amount'] = pd.to_numeric(df_transformed['amount'], errors='coerce')
+        # Data type conversions (explicit formats match the uploader's output)
+        if 'amount_cents' in df.columns:
+            df['amount_cents'] = pd.to_numeric(df['amount_cents'], errors='coerce').round().astype('Int32')
         
-        if 'date' in df_transformed.columns:
-            df_transformed['date'] = pd.to_datetime(df_transformed['date'], errors='coerce')
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce', cache=True)
         
-        if 'timestamp' in df_transformed.columns:
-            df_transformed['timestamp'] = pd.to_datetime(df_transformed['timestamp'], errors='coerce')
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', errors='coerce', cache=True)
         
         # Add processing metadata
-        df_transformed['processed_timestamp'] = datetime.now()
-        df_transformed['processed_by'] = 'lambda-etl-pipeline'
+        df['processed_timestamp'] = datetime.now()
+        df['processed_by'] = 'lambda-etl-pipeline'
         
         # Business logic transformations
-        if 'amount' in df_transformed.columns:
-            # Categorize transaction sizes
-            df_transformed['amount_category'] = df_transformed['amount'].apply(categorize_amount)
-            
+        if 'amount_cents' in df.columns:
             # Calculate absolute amount for analysis
-            df_transformed['amount_abs'] = df_transformed['amount'].abs()
+            df['amount_abs_cents'] = df['amount_cents'].abs()
+            
+            # Categorize transaction sizes
+            df['amount_category'] = categorize_amounts(df['amount_abs_cents'])
         
         # Add day of week for time-based analysis
-        if 'date' in df_transformed.columns:
-            df_transformed['day_of_week'] = df_transformed['date'].dt.day_name()
-            df_transformed['month'] = df_transformed['date'].dt.month
-            df_transformed['year'] = df_transformed['date'].dt.year
+        if 'date' in df.columns:
+            df['day_of_week'] = df['date'].dt.day_name()
+            df['month'] = df['date'].dt.month
+            df['year'] = df['date'].dt.year
         
         # Clean text fields
         text_columns = ['description', 'category', 'location']
         for col in text_columns:
-            if col in df_transformed.columns:
-                df_transformed[col] = df_transformed[col].astype(str).str.strip().str.title()
+            if col in df.columns:
+                df[col] = clean_text(df[col])
         
-        logger.info(f"Transformations completed. Final record count: {len(df_transformed)}")
+        logger.info(f"Transformations completed. Final record count: {len(df)}")
         
-        return df_transformed
+        return df
         
     except Exception as e:
         logger.error(f"Error in data transformation: {str(e)}")
         raise
 
 
-def categorize_amount(amount):
-    """Helper function to categorize transaction amounts"""
-    if pd.isna(amount):
-        return 'unknown'
-    
-    abs_amount = abs(amount)
-    if abs_amount < 25:
-        return 'small'
-    elif abs_amount < 100:
-        return 'medium'
-    elif abs_amount < 500:
-        return 'large'
-    else:
-        return 'very_large'
+def categorize_amounts(amount_abs):
+    """Helper function to categorize absolute transaction amounts (in cents) in one vectorized pass"""
+    categories = pd.cut(
+        amount_abs,
+        bins=[0, 2_500, 10_000, 50_000, np.inf],
+        labels=['small', 'medium', 'large', 'very_large'],
+        right=False
+    )
+    return categories.astype(object).fillna('unknown')
+
+
+def clean_text(series):
+    """Helper function to strip and title-case a text column using Arrow string kernels"""
+    # Clean each distinct value once, then expand back to the full column. Missing
+    # values get their own code (not -1) and pass through the kernels as nulls.
+    codes, uniques = pd.factorize(series.astype(str), use_na_sentinel=False)
+    uniques = pa.array(np.asarray(uniques, dtype=object), type=pa.string(), from_pandas=True)
+    cleaned = pc.utf8_title(pc.utf8_trim_whitespace(uniques))
+    values = np.asarray(cleaned.to_pylist(), dtype=object)[codes]
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def cents_to_decimal(cents):
+    """Helper function to convert integer cents to exact Decimal dollars (missing values become None)"""
+    return cents.astype(object).map(lambda value: None if pd.isna(value) else Decimal(int(value)).scaleb(-2))
 
 
 def is_redshift_configured():
@@ -173,13 +251,11 @@ def is_redshift_configured():
     return all(os.environ.get(var) for var in required_vars)
 
 
-def load_to_redshift(df, source_file):
-    """
-    Load transformed data to Redshift
-    """
-    logger.info("Loading data to Redshift")
+def get_redshift_connection():
+    """Return the cached Redshift connection, reconnecting if it is missing or closed"""
+    global _redshift_conn
     
-    try:
+    if _redshift_conn is None or _redshift_conn.closed:
         # Connection parameters from environment variables
         conn_params = {
             'host': os.environ['REDSHIFT_HOST'],
@@ -190,7 +266,21 @@ def load_to_redshift(df, source_file):
         }
         
         # Connect to Redshift
-        conn = psycopg2.connect(**conn_params)
+        _redshift_conn = psycopg2.connect(**conn_params)
+        logger.info("Opened new Redshift connection")
+    
+    return _redshift_conn
+
+
+def load_to_redshift(df, source_file):
+    """
+    Load transformed data to Redshift
+    """
+    logger.info("Loading data to Redshift")
+    
+    conn = None
+    try:
+        conn = get_redshift_connection()
         cursor = conn.cursor()
         
         # Create table if not exists
@@ -219,55 +309,40 @@ def load_to_redshift(df, source_file):
         cursor.execute(create_table_query)
         logger.info("Table created/verified")
         
-        # Insert data
-        insert_count = 0
-        for _, row in df.iterrows():
-            try:
-                insert_query = """
-                INSERT INTO portfolio_transactions (
-                    transaction_id, date, timestamp, amount, amount_abs, amount_category,
-                    category, description, transaction_type, account, location,
-                    day_of_week, month, year, processed_timestamp, processed_by, source_file
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (transaction_id) DO UPDATE SET
-                    amount = EXCLUDED.amount,
-                    processed_timestamp = EXCLUDED.processed_timestamp
-                """
-                
-                cursor.execute(insert_query, (
-                    row.get('transaction_id'),
-                    row.get('date'),
-                    row.get('timestamp'),
-                    row.get('amount'),
-                    row.get('amount_abs'),
-                    row.get('amount_category'),
-                    row.get('category'),
-                    row.get('description'),
-                    row.get('transaction_type'),
-                    row.get('account'),
-                    row.get('location'),
-                    row.get('day_of_week'),
-                    row.get('month'),
-                    row.get('year'),
-                    row.get('processed_timestamp'),
-                    row.get('processed_by'),
-                    source_file
-                ))
-                insert_count += 1
-                
-            except Exception as e:
-                logger.warning(f"Failed to insert row {row.get('transaction_id')}: {str(e)}")
-                continue
-        
-        # Commit changes
+        # Build row tuples in table column order; missing columns and NaN values become NULL
+        load_df = df.assign(source_file=source_file)
+        if 'amount_cents' in load_df.columns:
+            # The table stores dollars; convert from integer cents only at this boundary
+            load_df['amount'] = cents_to_decimal(load_df['amount_cents'])
+            load_df['amount_abs'] = cents_to_decimal(load_df['amount_abs_cents'])
+        load_df = load_df.reindex(columns=REDSHIFT_COLUMNS)
+        # A multi-row upsert can't touch the same id twice; keep the last row like the old per-row loop
+        load_df = load_df.drop_duplicates('transaction_id', keep='last')
+        load_df = load_df.astype(object).where(load_df.notna(), None)
+        rows = list(load_df.itertuples(index=False, name=None))
+        
+        # Insert data in multi-row batches instead of one round-trip per row
+        insert_query = f"""
+        INSERT INTO portfolio_transactions ({', '.join(REDSHIFT_COLUMNS)})
+        VALUES %s
+        ON CONFLICT (transaction_id) DO UPDATE SET
+            amount = EXCLUDED.amount,
+            processed_timestamp = EXCLUDED.processed_timestamp
+        """
+        execute_values(cursor, insert_query, rows, page_size=REDSHIFT_PAGE_SIZE)
+        insert_count = len(rows)
+        
+        # Commit changes; the connection stays open for the next invocation
         conn.commit()
         cursor.close()
-        conn.close()
         
         logger.info(f"Successfully loaded {insert_count} records to Redshift")
         
     except Exception as e:
         logger.error(f"Error loading to Redshift: {str(e)}")
+        # Don't leave an aborted transaction on the cached connection
+        if conn is not None and not conn.closed:
+            conn.rollback()
         raise
 
 
@@ -279,7 +354,7 @@ def save_processed_data(s3_client, bucket_name, df, original_key):
     
     try:
         # Create processed data key
-        processed_key = original_key.replace('raw-data', 'processed-data').replace('.csv', '.json')
+        processed_key = os.path.splitext(original_key.replace('raw-data', 'processed-data').removesuffix('.gz'))[0] + '.json'
         
         # Convert DataFrame to JSON
         json_data = df.to_json(orient='records', date_format='iso', default_handler=str)